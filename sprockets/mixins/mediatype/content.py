@@ -29,16 +29,12 @@ instances.
 """
 from __future__ import annotations
 
+import collections
+import functools
 import logging
 import typing
 import warnings
-
-try:
-    from typing import Literal
-except ImportError:  # pragma: no cover
-    # "ignore" is required to avoid an incompatible import
-    # error due to different bindings of _SpecialForm
-    from typing_extensions import Literal  # type: ignore
+from typing import Literal
 
 from ietfparse import algorithms, datastructures, errors, headers
 from tornado import web
@@ -50,6 +46,33 @@ SETTINGS_KEY = 'sprockets.mixins.mediatype.ContentSettings'
 """Key in application.settings to store the ContentSettings instance."""
 
 _warning_issued = False
+_RESPONSE_TYPE_CACHE_LIMIT = 128
+
+
+@functools.lru_cache(maxsize=128)
+def _get_media_type(content_type: str) -> str:
+    """Parse a content type header value into ``type/subtype[+suffix]``.
+
+    Servers usually see a handful of distinct values so the results
+    are cached instead of re-parsing the header on each request.
+
+    """
+    return _format_media_type(headers.parse_content_type(content_type))
+
+
+def _format_media_type(content_type: datastructures.ContentType) -> str:
+    """Format `content_type` as ``type/subtype[+suffix]``."""
+    media_type = '/'.join(
+        [content_type.content_type, content_type.content_subtype])
+    if content_type.content_suffix is not None:
+        media_type = '+'.join([media_type, content_type.content_suffix])
+    return media_type
+
+
+@functools.lru_cache(maxsize=128)
+def _normalize_content_type(content_type: str) -> str:
+    """Normalize a content type into a :class:`ContentSettings` key."""
+    return str(headers.parse_content_type(content_type))
 
 
 class ContentSettings:
@@ -96,16 +119,17 @@ class ContentSettings:
     _available_types: typing.List[datastructures.ContentType]
     _default_content_type: typing.Union[str, None]
     _handlers: typing.Dict[str, type_info.Transcoder]
+    _response_types: typing.OrderedDict[str, typing.Union[str, None]]
 
     def __init__(self) -> None:
         self._handlers = {}
         self._available_types = []
         self._default_content_type = None
+        self._response_types = collections.OrderedDict()
         self.default_encoding = None
 
     def __getitem__(self, content_type: str) -> type_info.Transcoder:
-        parsed = headers.parse_content_type(content_type)
-        return self._handlers[str(parsed)]
+        return self._handlers[_normalize_content_type(content_type)]
 
     def __setitem__(self, content_type: str,
                     handler: type_info.Transcoder) -> None:
@@ -118,6 +142,7 @@ class ContentSettings:
 
         self._available_types.append(parsed)
         self._handlers[content_type] = handler
+        self._response_types.clear()
 
     def get(
         self,
@@ -152,6 +177,40 @@ class ContentSettings:
                     ' content type is deprecated and will become an error'
                     ' in a future version'))
         self._default_content_type = new_value
+        self._response_types.clear()
+
+    def select_response_type(self, accept: str) -> typing.Union[str, None]:
+        """Negotiate the response content type for an Accept header.
+
+        :param accept: the :http:header:`Accept` header value
+        :returns: the selected content type as ``type/subtype[+suffix]``
+            or :attr:`default_content_type` if nothing matches
+
+        Results are kept in a small least-recently-used cache that is
+        reset when a content type is registered or the default changes.
+
+        """
+        try:
+            response_type = self._response_types[accept]
+        except KeyError:
+            pass
+        else:
+            self._response_types.move_to_end(accept)
+            return response_type
+
+        try:
+            selected, _ = algorithms.select_content_type(
+                headers.parse_accept(accept), self._available_types)
+            response_type = _format_media_type(selected)
+        except errors.NoMatch:
+            response_type = self._default_content_type
+
+        # Header values are client data so the oldest entry is evicted
+        # instead of letting the cache grow without bound.
+        self._response_types[accept] = response_type
+        if len(self._response_types) > _RESPONSE_TYPE_CACHE_LIMIT:
+            self._response_types.popitem(last=False)
+        return response_type
 
 
 def install(application: type_info.HasSettings,
@@ -159,8 +218,7 @@ def install(application: type_info.HasSettings,
             encoding: typing.Optional[str] = None) -> ContentSettings:
     """Install the media type management settings and return it"""
     try:
-        settings = typing.cast(ContentSettings,
-                               application.settings[SETTINGS_KEY])
+        settings: ContentSettings = application.settings[SETTINGS_KEY]
     except KeyError:
         settings = application.settings[SETTINGS_KEY] = ContentSettings()
         settings.default_content_type = default_content_type
@@ -198,7 +256,8 @@ def get_settings(
 
     """
     try:
-        return typing.cast(ContentSettings, application.settings[SETTINGS_KEY])
+        settings: ContentSettings = application.settings[SETTINGS_KEY]
+        return settings
     except KeyError:
         if not force_instance:
             return None
@@ -331,20 +390,10 @@ class ContentMixin(web.RequestHandler):
         """
         if self._best_response_match is None:
             settings = get_settings(self.application, force_instance=True)
-            acceptable = headers.parse_accept(
+            self._best_response_match = settings.select_response_type(
                 self.request.headers.get(
                     'Accept', settings.default_content_type
                     if settings.default_content_type else '*/*'))
-            try:
-                selected, _ = algorithms.select_content_type(
-                    acceptable, settings.available_content_types)
-                self._best_response_match = '/'.join(
-                    [selected.content_type, selected.content_subtype])
-                if selected.content_suffix is not None:
-                    self._best_response_match = '+'.join(
-                        [self._best_response_match, selected.content_suffix])
-            except errors.NoMatch:
-                self._best_response_match = settings.default_content_type
 
         return self._best_response_match
 
@@ -365,20 +414,14 @@ class ContentMixin(web.RequestHandler):
                 'Content-Type', settings.default_content_type)
 
             try:
-                content_type_header = headers.parse_content_type(content_type)
+                content_type = _get_media_type(content_type)
             except ValueError:
                 raise web.HTTPError(400, 'failed to parse content type %s',
                                     content_type)
-            content_type = '/'.join([
-                content_type_header.content_type,
-                content_type_header.content_subtype
-            ])
-            if content_type_header.content_suffix is not None:
-                content_type = '+'.join(
-                    [content_type, content_type_header.content_suffix])
-            try:
-                handler = settings[content_type]
-            except KeyError:
+            # _get_media_type returns the same string that ContentSettings
+            # uses as the key so skip the re-parse in __getitem__
+            handler = settings.get(content_type)
+            if handler is None:
                 raise web.HTTPError(415, 'cannot decode body of type %s',
                                     content_type)
 
@@ -9,12 +9,67 @@ Basic content handlers.
 """
 from __future__ import annotations
 
+import itertools
 import typing
 
 from tornado import escape
 
 from sprockets.mixins.mediatype import type_info
 
+_SCALAR_TYPES = frozenset({type(None), bool, float, int, str})
+
+
+def _any_value(datum: typing.Any,
+               inspect: typing.Callable[[typing.Any], typing.Any],
+               skip_types: typing.AbstractSet[type] = frozenset(),
+               shared_matches: bool = False) -> bool:
+    """Does `inspect` match `datum` or any value nested in it?
+
+    `inspect` is not called for values whose exact type is in
+    `skip_types`.  It returns :data:`True` for a matching value, an
+    iterable of the nested values to scan for a container, or
+    :data:`None` otherwise.
+
+    """
+    # Values are walked with an explicit stack instead of recursing.
+    # Containers that are reached twice are only scanned once, or count
+    # as a match if `shared_matches` is set, so self-referential values
+    # cannot loop forever.
+    stack = [datum]
+    pop, extend = stack.pop, stack.extend
+    seen: typing.Set[int] = set()
+    while stack:
+        value = pop()
+        if type(value) in skip_types:
+            continue
+        found = inspect(value)
+        if found is None:
+            continue
+        if found is True:
+            return True
+        if id(value) not in seen:
+            seen.add(id(value))
+            extend(found)
+        elif shared_matches:
+            return True
+    return False
+
+
+def _find_bytes(value: typing.Any) -> typing.Any:
+    # mirrors the types that tornado.escape.recursive_unicode converts
+    if isinstance(value, bytes):
+        return True
+    if isinstance(value, dict):
+        return itertools.chain(value, value.values())
+    if isinstance(value, (list, tuple)):
+        return value
+    return None
+
+
+def _contains_bytes(datum: typing.Any) -> bool:
+    """Would :func:`tornado.escape.recursive_unicode` change `datum`?"""
+    return _any_value(datum, _find_bytes, _SCALAR_TYPES)
+
 
 class BinaryContentHandler:
     """
@@ -89,6 +144,7 @@ class TextContentHandler:
     def __init__(self, content_type: str, dumps: type_info.DumpSFunction,
                  loads: type_info.LoadSFunction,
                  default_encoding: str) -> None:
+        self._content_types: typing.Dict[str, str] = {}
         self._dumps = dumps
         self._loads = loads
         self.content_type = content_type
@@ -109,11 +165,18 @@ class TextContentHandler:
             type and the :class:`bytes` representation of
             `inst_data`
 
+        Byte strings in `inst_data` are decoded with
+        :func:`tornado.escape.recursive_unicode` which also converts
+        :class:`dict`, :class:`list`, and :class:`tuple` subclasses
+        into the base types.  `inst_data` is passed to the ``dumps``
+        function unchanged when it does not contain byte strings.
+
         """
         selected = encoding or self.default_encoding
-        content_type = '{0}; charset="{1}"'.format(self.content_type, selected)
-        dumped = self._dumps(escape.recursive_unicode(inst_data))
-        return content_type, dumped.encode(selected)
+        if _contains_bytes(inst_data):
+            inst_data = escape.recursive_unicode(inst_data)
+        dumped = self._dumps(inst_data)
+        return self._get_content_type(selected), dumped.encode(selected)
 
     def from_bytes(
             self,
@@ -130,3 +193,11 @@ class TextContentHandler:
 
         """
         return self._loads(data.decode(encoding or self.default_encoding))
+
+    def _get_content_type(self, encoding: str) -> str:
+        try:
+            return self._content_types[encoding]
+        except KeyError:
+            content_type = f'{self.content_type}; charset="{encoding}"'
+            self._content_types[encoding] = content_type
+            return content_type
@@ -8,30 +8,260 @@ Bundled media type transcoders.
 """
 from __future__ import annotations
 
-import base64
+import binascii
+import codecs
 import dataclasses
+import datetime
+import functools
 import json
+import re
 import string
+import threading
 import typing
 import urllib.parse
 import uuid
 
 import collections.abc
 
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None  # type: ignore
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
 try:
     import umsgpack
 except ImportError:  # pragma: no cover
     umsgpack = None  # type: ignore
 
-from sprockets.mixins.mediatype import handlers, type_info
+try:
+    from pybase64 import b64encode_as_string as _b64encode
+except ImportError:
+
+    def _b64encode(s):  # type: ignore
+        return binascii.b2a_base64(s, newline=False).decode('ASCII')
 
-_FORM_URLENCODING = {c: '%{:02X}'.format(c) for c in range(0, 255)}
-_FORM_URLENCODING.update({ord(c): c for c in string.ascii_letters})
-_FORM_URLENCODING.update({ord(c): c for c in string.digits})
-_FORM_URLENCODING.update({ord(c): c for c in '*-_.'})
 
-_FORM_URLENCODING_PLUS = _FORM_URLENCODING.copy()
-_FORM_URLENCODING_PLUS[ord(' ')] = '+'
+from sprockets.mixins.mediatype import handlers, type_info
+
+# Translation tables from octet value to the encoded string.  These
+# are tuples since indexing a tuple is cheaper than a dict lookup.
+_FORM_URLENCODING_SAFE = string.ascii_letters + string.digits + '*-_.'
+_FORM_URLENCODING = tuple(
+    chr(c) if chr(c) in _FORM_URLENCODING_SAFE else '%{:02X}'.format(c)
+    for c in range(0, 256))
+_FORM_URLENCODING_PLUS = tuple('+' if c == ord(' ') else s
+                               for c, s in enumerate(_FORM_URLENCODING))
+_FORM_URLENCODING_SAFE_RE = re.compile(r'[A-Za-z0-9*\-_.]*')
+
+# Type tuples for isinstance checks in the form transcoder.  Building
+# them once saves the global lookups and tuple construction on every
+# call.
+_BUFFER_TYPES = (bytearray, bytes, memoryview)
+_ISO_FORMAT_TYPES = (datetime.date, datetime.time)
+_STRINGIFIED_TYPES = (float, int, uuid.UUID)
+_UNSPLIT_TYPES = _BUFFER_TYPES + (str, )
+
+
+@functools.lru_cache(maxsize=None)
+def _is_utf8(encoding: str) -> bool:
+    return codecs.lookup(encoding).name == 'utf-8'
+
+
+@functools.lru_cache(maxsize=None)
+def _is_ascii_compatible(encoding: str) -> bool:
+    safe = _FORM_URLENCODING_SAFE
+    return safe.encode(encoding) == safe.encode('ascii')
+
+
+# Date & time values are passed to dump_object so that they are
+# formatted exactly as they are by the json module.  Non-string keys
+# are rejected so that the json module formats them instead.
+_ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _json_memoryview(datum: memoryview) -> str:
+    return _b64encode(datum if datum.c_contiguous else datum.tobytes())
+
+
+# String conversion functions for the types that JSONTranscoder
+# supports keyed by the exact type.  JSONTranscoder.dump_object uses
+# this table before falling back to isinstance checks for subclasses
+# and objects that implement isoformat.
+_JSON_DUMPERS: typing.Dict[type, typing.Callable[[typing.Any], str]] = {
+    bytearray: _b64encode,
+    bytes: _b64encode,
+    datetime.date: datetime.date.isoformat,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.time: datetime.time.isoformat,
+    memoryview: _json_memoryview,
+    uuid.UUID: uuid.UUID.__str__,
+}
+
+# Exact types that orjson encodes the same way as the json module with
+# JSONTranscoder.dump_object as the default hook.
+_ORJSON_SAFE_TYPES = frozenset([type(None), bool, int, *_JSON_DUMPERS])
+
+
+def _differs_in_orjson(value: typing.Any) -> typing.Any:
+    # orjson writes non-finite floats as null, formats exponents
+    # differently (1e16 vs 1e+16), does not escape DEL or non-ASCII
+    # characters, and encodes types such as Enum members that the json
+    # module rejects.  Python only uses an exponent outside of the range
+    # below.  Keys are not scanned since they are rarely non-ASCII and
+    # orjson's output is checked as well.
+    value_type = type(value)
+    if value_type is str:
+        return None if value.isascii() and '\x7f' not in value else True
+    if value_type is float:
+        return None if value == 0.0 or 1e-4 <= abs(value) < 1e16 else True
+    if value_type is dict:
+        return value.values()
+    if value_type is list or value_type is tuple:
+        return value
+    return True
+
+
+def _is_orjson_safe(datum: typing.Any) -> bool:
+    """Will orjson encode `datum` exactly like the json module?"""
+    # The scan stops at the first value that differs so that the json
+    # module does the work without encoding with orjson first.  Cycles
+    # make orjson fail so they end up in the json module as well.
+    return not handlers._any_value(datum, _differs_in_orjson,
+                                   _ORJSON_SAFE_TYPES)
+
+
+def _msgpack_identity(_: MsgPackTranscoder,
+                      datum: type_info.MsgPackable) -> type_info.MsgPackable:
+    return datum
+
+
+def _msgpack_buffer(transcoder: MsgPackTranscoder,
+                    datum: typing.Union[bytearray, memoryview]) -> typing.Any:
+    # msgpack packs contiguous buffers directly so avoid copying them
+    if transcoder._packs_buffers and (isinstance(datum, bytearray)
+                                      or datum.c_contiguous):
+        return datum
+    return bytes(datum)
+
+
+def _msgpack_frame(
+    datum: typing.Any
+) -> typing.Tuple[typing.Any, typing.Iterator[typing.Tuple[typing.Any,
+                                                           typing.Any]]]:
+    if type(datum) is dict or isinstance(datum, collections.abc.Mapping):
+        return {}, iter(datum.items())
+    return [None] * len(datum), enumerate(datum)
+
+
+def _msgpack_container(transcoder: MsgPackTranscoder,
+                       datum: typing.Any) -> type_info.MsgPackable:
+    # Nested containers are walked with an explicit stack of
+    # (iterator, output) frames instead of recursing so that deeply
+    # nested values do not exhaust the interpreter stack.  Sequence
+    # outputs are preallocated so that both frame types can store
+    # values with ``out[key] = value``.  Nesting is bounded so that
+    # self-referential values fail instead of growing the stack forever.
+    normalize = transcoder.normalize_datum
+    if transcoder._normalize_overridden:
+        # Overrides expect to see every nested value so they are called
+        # recursively instead of taking the shortcuts below.
+        if isinstance(datum, collections.abc.Mapping):
+            return {key: normalize(value) for key, value in datum.items()}
+        return [normalize(value) for value in datum]
+
+    is_scalar = _MSGPACK_SCALAR_TYPES.__contains__
+    container_types = _MSGPACK_CONTAINER_TYPES
+    root, items = _msgpack_frame(datum)
+    normalized: type_info.MsgPackable = root
+    stack = [(items, root)]
+    while stack:
+        items, out = stack[-1]
+        for key, value in items:
+            value_type = type(value)
+            if is_scalar(value_type):
+                out[key] = value
+            elif value_type in container_types:
+                # Containers that only hold scalars are packable as-is
+                # and checking that with map() is much cheaper than
+                # walking them.
+                values = value.values() if value_type is dict else value
+                if (value_type in _MSGPACK_PASSTHROUGH_TYPES
+                        and all(map(is_scalar, map(type, values)))):
+                    out[key] = value
+                else:
+                    child, child_items = _msgpack_frame(value)
+                    out[key] = child
+                    stack.append((child_items, child))
+                    if len(stack) > _MSGPACK_MAX_DEPTH:
+                        raise ValueError('msgpack nesting limit exceeded')
+                    break
+            else:
+                out[key] = normalize(value)
+        else:
+            stack.pop()
+    return normalized
+
+
+# Packers keep their internal buffer at its largest size so packers
+# that produced more than this are discarded instead of being reused.
+_MSGPACK_PACKER_REUSE_LIMIT = 64 * 1024
+
+# Nesting limit of the Packer in msgpack 1.0.  Normalized values that
+# are nested deeper than this would not be packable anyway.
+_MSGPACK_MAX_DEPTH = 511
+_MSGPACK_SCALAR_TYPES = frozenset({type(None), bool, bytes, float, int, str})
+_MSGPACK_CONTAINER_TYPES = frozenset({dict, frozenset, list, set, tuple})
+_MSGPACK_PASSTHROUGH_TYPES = frozenset({dict, list, tuple})
+
+
+def _needs_msgpack_normalizing(value: typing.Any) -> typing.Any:
+    value_type = type(value)
+    if value_type is list:
+        return value
+    if value_type is dict:
+        return value.values()
+    return True
+
+
+def _is_msgpack_ready(datum: typing.Any) -> bool:
+    """Can `datum` be packed without normalizing it?"""
+    # Containers that are reached twice may be part of a cycle so they
+    # are left to normalize_datum which bounds the nesting depth.
+    return not handlers._any_value(datum,
+                                   _needs_msgpack_normalizing,
+                                   _MSGPACK_SCALAR_TYPES,
+                                   shared_matches=True)
+
+
+# Normalization functions for common concrete types keyed by the
+# exact type.  MsgPackTranscoder.normalize_datum consults this table
+# with a single dict lookup before falling back to the slower chain
+# of isinstance checks for subclasses and abstract types.
+_MSGPACK_NORMALIZERS: typing.Dict[type, typing.Callable[
+    [MsgPackTranscoder, typing.Any], type_info.MsgPackable]] = {
+        type(None): _msgpack_identity,
+        bool: _msgpack_identity,
+        bytes: _msgpack_identity,
+        float: _msgpack_identity,
+        int: _msgpack_identity,
+        str: _msgpack_identity,
+        bytearray: _msgpack_buffer,
+        memoryview: _msgpack_buffer,
+        uuid.UUID: lambda _, datum: uuid.UUID.__str__(datum),
+        datetime.date: lambda _, datum: datum.isoformat(),
+        datetime.datetime: lambda _, datum: datum.isoformat(),
+        datetime.time: lambda _, datum: datum.isoformat(),
+        dict: _msgpack_container,
+        frozenset: _msgpack_container,
+        list: _msgpack_container,
+        set: _msgpack_container,
+        tuple: _msgpack_container,
+    }
 
 
 class JSONTranscoder(handlers.TextContentHandler):
@@ -48,7 +278,10 @@ class JSONTranscoder(handlers.TextContentHandler):
     This JSON encoder uses :func:`json.loads` and :func:`json.dumps` to
     implement JSON encoding/decoding.  The :meth:`dump_object` method is
     configured to handle types that the standard JSON module does not
-    support.
+    support.  If `orjson`_ is installed, then it is used to implement
+    :meth:`.dumps` as long as :attr:`dump_options` and :meth:`dump_object`
+    are not modified and the output is identical to what
+    :func:`json.dumps` produces.
 
     .. attribute:: dump_options
 
@@ -56,6 +289,8 @@ class JSONTranscoder(handlers.TextContentHandler):
        :meth:`.dumps` is called.  By default, the :meth:`dump_object`
        method is enabled as the default object hook.
 
+    .. _orjson: https://github.com/ijl/orjson
+
     .. attribute:: load_options
 
        Keyword parameters that are passed to :func:`json.loads` when
@@ -75,15 +310,96 @@ class JSONTranscoder(handlers.TextContentHandler):
             'separators': (',', ':'),
         }
         self.load_options = {}
+        self._default_dump_options = self.dump_options.copy()
+        self._encoder_options: typing.Optional[typing.Dict[str,
+                                                           typing.Any]] = None
+        self._encode: typing.Callable[[type_info.Serializable], str]
+        self._dumps_overridden = type(self).dumps is not JSONTranscoder.dumps
+        # orjson encodes some types natively without calling dump_object
+        self._dump_object_overridden = (type(self).dump_object
+                                        is not JSONTranscoder.dump_object)
+
+    def to_bytes(
+            self,
+            inst_data: type_info.Serializable,
+            encoding: typing.Optional[str] = None) -> typing.Tuple[str, bytes]:
+        """
+        Transform an object into :class:`bytes`.
+
+        :param inst_data: object to encode
+        :param encoding: character set used to encode the bytes
+            returned from the ``dumps`` function.  This defaults to
+            :attr:`default_encoding`
+        :returns: :class:`tuple` of the selected content
+            type and the :class:`bytes` representation of
+            `inst_data`
+
+        The result is identical to :meth:`.TextContentHandler.to_bytes`.
+        When `orjson`_ can be used as described for :meth:`.dumps` and
+        the selected encoding is UTF-8, `inst_data` is serialized
+        directly into :class:`bytes` in a single pass.
+
+        """
+        selected = encoding or self.default_encoding
+        if (self._uses_orjson() and not self._dumps_overridden
+                and _is_utf8(selected) and _is_orjson_safe(inst_data)):
+            # _dump_text_object decodes byte strings the same way that
+            # tornado.escape.recursive_unicode does in the base class.
+            dumped = self._orjson_dumps(inst_data, self._dump_text_object)
+            if dumped is not None:
+                return self._get_content_type(selected), dumped
+        return super().to_bytes(inst_data, selected)
 
     def dumps(self, obj: type_info.Serializable) -> str:
         """Dump a :class:`object` instance into a JSON :class:`str`"""
-        return json.dumps(obj, **self.dump_options)
+        if self._uses_orjson() and _is_orjson_safe(obj):
+            dumped = self._orjson_dumps(obj, self.dump_object)
+            if dumped is not None:
+                return dumped.decode('ascii')
+
+        # json.dumps creates a new encoder on every call when it is
+        # given options so we keep one around until they change
+        if self.dump_options != self._encoder_options:
+            options = self.dump_options.copy()
+            encoder_class = options.pop('cls', None) or json.JSONEncoder
+            self._encode = encoder_class(**options).encode
+            self._encoder_options = self.dump_options.copy()
+        return self._encode(obj)
+
+    def _uses_orjson(self) -> bool:
+        return (orjson is not None and not self._dump_object_overridden
+                and self.dump_options == self._default_dump_options)
+
+    @staticmethod
+    def _orjson_dumps(
+        obj: type_info.Serializable,
+        default: typing.Callable[[typing.Any], str],
+    ) -> typing.Optional[bytes]:
+        # orjson cannot encode integers wider than 64 bits, non-string
+        # keys, or self-referential values so None is returned to fall
+        # back to the json module.  The same happens when a key or the
+        # result of `default` contains characters that the json module
+        # would escape.
+        try:
+            dumped: bytes = orjson.dumps(obj,
+                                         default=default,
+                                         option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return None
+        if dumped.isascii() and b'\x7f' not in dumped:
+            return dumped
+        return None
+
+    def _dump_text_object(self, obj: type_info.Serializable) -> str:
+        if isinstance(obj, bytes):
+            return obj.decode('utf-8')
+        return self.dump_object(obj)
 
     def loads(self, str_repr: str) -> type_info.Deserialized:
         """Transform :class:`str` into an :class:`object` instance."""
-        return typing.cast(type_info.Deserialized,
-                           json.loads(str_repr, **self.load_options))
+        loaded: type_info.Deserialized = json.loads(str_repr,
+                                                    **self.load_options)
+        return loaded
 
     def dump_object(self, obj: type_info.Serializable) -> str:
         """
@@ -113,12 +429,16 @@ class JSONTranscoder(handlers.TextContentHandler):
         +----------------------------+---------------------------------------+
 
         """
+        dumper = _JSON_DUMPERS.get(type(obj))
+        if dumper is not None:
+            return dumper(obj)
+
         if isinstance(obj, uuid.UUID):
             return str(obj)
         if hasattr(obj, 'isoformat'):
             return typing.cast(type_info.DefinesIsoFormat, obj).isoformat()
-        if isinstance(obj, (bytes, bytearray, memoryview)):
-            return base64.b64encode(obj).decode('ASCII')
+        if isinstance(obj, (bytes, bytearray)):
+            return _b64encode(obj)
         raise TypeError('{!r} is not JSON serializable'.format(obj))
 
 
@@ -130,9 +450,11 @@ class MsgPackTranscoder(handlers.BinaryContentHandler):
         implements. If omitted, ``application/msgpack`` is used. This
         is passed directly to the ``BinaryContentHandler`` initializer.
 
-    This transcoder uses the `umsgpack`_ library to encode and decode
-    objects according to the `msgpack format`_.
+    This transcoder uses the `msgpack`_ C extension to encode and decode
+    objects according to the `msgpack format`_.  The pure Python
+    `umsgpack`_ library is used if :mod:`msgpack` is not installed.
 
+    .. _msgpack: https://github.com/msgpack/msgpack-python
     .. _umsgpack: https://github.com/vsergeev/u-msgpack-python
     .. _msgpack format: http://msgpack.org/index.html
 
@@ -140,31 +462,93 @@ class MsgPackTranscoder(handlers.BinaryContentHandler):
     PACKABLE_TYPES = (bool, int, float)
 
     def __init__(self, content_type: str = 'application/msgpack') -> None:
-        if umsgpack is None:
+        self._msgpack_packb: type_info.PackBFunction
+        self._msgpack_unpackb: typing.Callable[[bytes], type_info.Deserialized]
+        self._normalize_overridden = (type(self).normalize_datum
+                                      is not MsgPackTranscoder.normalize_datum)
+        if msgpack is not None:
+            self._packers = threading.local()
+            self._packs_with_default = not self._normalize_overridden
+            self._msgpack_packb = self._pack_with_packer
+            self._msgpack_unpackb = functools.partial(msgpack.unpackb,
+                                                      raw=False,
+                                                      strict_map_key=False)
+            self._packs_buffers = True
+        elif umsgpack is not None:
+            self._msgpack_packb = umsgpack.packb
+            self._msgpack_unpackb = umsgpack.unpackb
+            self._packs_buffers = False
+            self._packs_with_default = False
+        else:
             raise RuntimeError('Cannot import MsgPackTranscoder, '
-                               'umsgpack is not available')
+                               'msgpack is not available')
 
         super().__init__(content_type, self.packb, self.unpackb)
 
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        # thread locals cannot be pickled or copied, each copy of the
+        # transcoder creates its own packers instead
+        state = self.__dict__.copy()
+        state.pop('_packers', None)
+        return state
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        self.__dict__.update(state)
+        self._packers = threading.local()
+
     def packb(self, data: type_info.Serializable) -> bytes:
-        """Pack `data` into a :class:`bytes` instance."""
-        return umsgpack.packb(self.normalize_datum(data))
+        """Pack `data` into a :class:`bytes` instance.
+
+        When the :mod:`msgpack` C extension is used, `data` is packed
+        in a single pass and only the values that it cannot pack
+        natively are passed through :meth:`.normalize_datum`.
+        Otherwise, `data` is passed through :meth:`.normalize_datum`
+        unless it only contains values that msgpack handles natively
+        and :meth:`.normalize_datum` is not overridden.
+
+        """
+        if self._packs_with_default:
+            try:
+                return self._msgpack_packb(data)
+            except BufferError:  # non-contiguous memoryview
+                pass
+        elif not self._normalize_overridden and _is_msgpack_ready(data):
+            return self._msgpack_packb(data)
+        return self._msgpack_packb(self.normalize_datum(data))
 
     def unpackb(self, data: bytes) -> type_info.Deserialized:
         """Unpack a :class:`object` from a :class:`bytes` instance."""
-        return umsgpack.unpackb(data)
+        return self._msgpack_unpackb(data)
+
+    def _pack_with_packer(self, data: type_info.Serializable) -> bytes:
+        # msgpack.packb creates a new Packer on each call.  Reusing one
+        # saves that setup cost but packers are not thread safe so we
+        # keep one for each thread.  The packer's buffer never shrinks
+        # so a large result would otherwise pin that memory per thread.
+        try:
+            packer = self._packers.packer
+        except AttributeError:
+            packer = self._packers.packer = msgpack.Packer(
+                default=(self.normalize_datum
+                         if self._packs_with_default else None),
+                use_bin_type=True)
+        packed: bytes = packer.pack(data)
+        if len(packed) > _MSGPACK_PACKER_REUSE_LIMIT:
+            del self._packers.packer
+        return packed
 
     def normalize_datum(
             self, datum: type_info.Serializable) -> type_info.MsgPackable:
         """
-        Convert `datum` into something that umsgpack likes.
+        Convert `datum` into something that msgpack likes.
 
-        :param datum: something that we want to process with umsgpack
+        :param datum: something that we want to process with msgpack
         :return: a packable version of `datum`
         :raises TypeError: if `datum` cannot be packed
+        :raises ValueError: if `datum` is nested too deeply
 
         This message is called by :meth:`.packb` to recursively normalize
-        an input value before passing it to :func:`umsgpack.packb`.  Values
+        an input value before passing it to :func:`msgpack.packb`.  Values
         are normalized according to the following table.
 
         +-----------------------------------+-------------------------------+
@@ -218,8 +602,9 @@ class MsgPackTranscoder(handlers.BinaryContentHandler):
            0b8f5ac67cdd130f4d4d4fe6afb839b989fdb86a/spec.md#bin-format-family
 
         """
-        if datum is None:
-            return datum
+        normalizer = _MSGPACK_NORMALIZERS.get(type(datum))
+        if normalizer is not None:
+            return normalizer(self, datum)
 
         if isinstance(datum, self.PACKABLE_TYPES):
             return datum
@@ -230,23 +615,15 @@ class MsgPackTranscoder(handlers.BinaryContentHandler):
         if isinstance(datum, bytearray):
             datum = bytes(datum)
 
-        if isinstance(datum, memoryview):
-            datum = datum.tobytes()
-
         if hasattr(datum, 'isoformat'):
             datum = typing.cast(type_info.DefinesIsoFormat, datum).isoformat()
 
         if isinstance(datum, (bytes, str)):
             return datum
 
-        if isinstance(datum, (collections.abc.Sequence, collections.abc.Set)):
-            return [self.normalize_datum(item) for item in datum]
-
-        if isinstance(datum, collections.abc.Mapping):
-            out = {}
-            for k, v in datum.items():
-                out[k] = self.normalize_datum(v)
-            return out
+        if isinstance(datum, (collections.abc.Mapping,
+                              collections.abc.Sequence, collections.abc.Set)):
+            return _msgpack_container(self, datum)
 
         raise TypeError('{} is not msgpackable'.format(
             datum.__class__.__name__))
@@ -362,7 +739,7 @@ class FormUrlEncodedTranscoder:
         # Select the appropriate encoding table and use the default
         # character encoding if necessary.  Binding these to local
         # names removes branches from the inner loop.
-        chr_map: typing.Mapping[int, str]
+        chr_map: typing.Sequence[str]
         chr_map = (_FORM_URLENCODING_PLUS
                    if self.options.space_as_plus else _FORM_URLENCODING)
         if encoding is None:
@@ -378,14 +755,19 @@ class FormUrlEncodedTranscoder:
             tuples = [(inst_data, None)]
 
         prefix = ''  # another micro-optimization
-        buf = []
+        buf: typing.List[str] = []
+        append, encode = buf.append, self._encode
         for name, value in tuples:
-            buf.append(prefix)
-            buf.extend(self._encode(name, chr_map, encoding))
+            append(prefix)
+            append(encode(name, chr_map, encoding))
             if value is not None:
-                buf.append('=')
-                buf.extend(self._encode(value, chr_map, encoding))
+                append('=')
+                append(encode(value, chr_map, encoding))
             prefix = '&'
+
+        # Joining str segments and encoding the result once is faster
+        # than joining per-octet bytes tables since the final encode
+        # of an ASCII string is a single copy.
         encoded = ''.join(buf)
 
         return self.content_type, encoded.encode('ascii')
@@ -415,45 +797,60 @@ class FormUrlEncodedTranscoder:
         if encoding is None:
             encoding = self.options.encoding
 
-        output = []
+        # urllib.parse.parse_qsl is implemented in Python as well and
+        # always treats "+" as a space, so splitting here is both faster
+        # and lets us honor the space_as_plus option directly.
+        output: typing.List[typing.Tuple[str, str]] = []
+        append = output.append
         for part in data_bytes.decode('ascii').split('&'):
             if not part:
                 continue
             name, eq_present, value = part.partition('=')
             name = dequote(name, encoding=encoding)
             if eq_present:
-                output.append((name, dequote(value, encoding=encoding)))
+                append((name, dequote(value, encoding=encoding)))
             else:
-                output.append((name, ''))
+                append((name, ''))
 
         return dict(output)
 
     def _encode(self, datum: typing.Union[bool, None, float, int, str,
                                           type_info.DefinesIsoFormat],
-                char_map: typing.Mapping[int, str], encoding: str) -> str:
-        if isinstance(datum, str):
+                char_map: typing.Sequence[str], encoding: str) -> str:
+        if type(datum) is str:
             pass  # optimization: skip additional checks for strings
-        elif (isinstance(datum, (float, int, str, uuid.UUID))
+        elif type(datum) is int or type(datum) is float:
+            datum = str(datum)
+        elif isinstance(datum, str):
+            pass
+        elif (isinstance(datum, _STRINGIFIED_TYPES)
               and not isinstance(datum, bool)):
             datum = str(datum)
         elif (isinstance(datum, collections.abc.Hashable)
               and datum in self.options.literal_mapping):
             # the isinstance Hashable check confuses mypy
             datum = self.options.literal_mapping[datum]  # type: ignore
-        elif isinstance(datum, (bytearray, bytes, memoryview)):
-            return ''.join(char_map[c] for c in datum)
-        elif isinstance(datum, type_info.DefinesIsoFormat):
+        elif isinstance(datum, _BUFFER_TYPES):
+            return ''.join([char_map[c] for c in datum])
+        elif isinstance(datum, _ISO_FORMAT_TYPES):
             datum = datum.isoformat()
+        elif hasattr(datum, 'isoformat'):
+            # isinstance against the runtime checkable DefinesIsoFormat
+            # protocol costs several microseconds per value
+            datum = typing.cast(type_info.DefinesIsoFormat, datum).isoformat()
         else:
             datum = str(datum)
 
-        return ''.join(char_map[c] for c in datum.encode(encoding))
+        if (_FORM_URLENCODING_SAFE_RE.fullmatch(datum)
+                and _is_ascii_compatible(encoding)):
+            return datum  # nothing to quote
+        return ''.join([char_map[c] for c in datum.encode(encoding)])
 
     def _convert_to_tuple_sequence(
         self, value: type_info.Serializable
     ) -> typing.Iterable[typing.Tuple[typing.Any, typing.Any]]:
         tuples: typing.Iterable[typing.Tuple[typing.Any, typing.Any]]
-        if isinstance(value, collections.abc.Mapping):
+        if type(value) is dict or isinstance(value, collections.abc.Mapping):
             tuples = value.items()
         else:
             try:
@@ -462,9 +859,9 @@ class FormUrlEncodedTranscoder:
                 raise TypeError('Cannot convert value to sequence of tuples')
 
         if self.options.encode_sequences:
-            out_tuples = []
+            out_tuples: typing.List[typing.Tuple[typing.Any, typing.Any]] = []
             for a, b in tuples:
-                if (not isinstance(b, (bytes, bytearray, memoryview, str))
+                if (not isinstance(b, _UNSPLIT_TYPES)
                         and isinstance(b, collections.abc.Iterable)):
                     for value in b:
                         out_tuples.append((a, value))
@@ -2,13 +2,7 @@ from __future__ import annotations
 
 import typing
 import uuid
-
-try:
-    from typing import Protocol, runtime_checkable
-except ImportError:
-    # "ignore" is required to avoid an incompatible import
-    # error due to different bindings of _SpecialForm
-    from typing_extensions import Protocol, runtime_checkable  # type: ignore
+from typing import Protocol, runtime_checkable
 
 
 @runtime_checkable
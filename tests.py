@@ -1,15 +1,21 @@
 import base64
+import collections
+import copy
 import datetime
+import enum
+import importlib.util
 import json
 import math
-import os
 import pickle
 import struct
+import sys
+import threading
 import typing
 import unittest.mock
+import urllib.parse
 import uuid
 
-from ietfparse import algorithms
+from ietfparse import algorithms, headers
 from tornado import httputil, testing, web
 import umsgpack
 
@@ -18,17 +24,16 @@ from sprockets.mixins.mediatype import (content, handlers, transcoders,
 import examples
 
 
-class UTC(datetime.tzinfo):
-    ZERO = datetime.timedelta(0)
+class IntEnum(enum.IntEnum):
+    ONE = 1
 
-    def utcoffset(self, dt):
-        return self.ZERO
 
-    def dst(self, dt):
-        return self.ZERO
+class PlainEnum(enum.Enum):
+    VALUE = 'value'
 
-    def tzname(self, dt):
-        return 'UTC'
+
+class StrEnum(str, enum.Enum):
+    VALUE = 'value'
 
 
 class Context:
@@ -37,18 +42,31 @@ class Context:
         self.settings = {}
 
 
+EMPTY_MSGPACK_MAP = b'\x80'
+
+# Deterministic stand-in for random binary data that contains every
+# octet value.
+SAMPLE_BYTES = bytes(range(256))
+SAMPLE_JSON = '{"bin":"%s"}' % base64.b64encode(SAMPLE_BYTES).decode()
+
+_FIXED_PREFIX = struct.Struct('B')
+_PREFIX_8 = struct.Struct('BB')
+_PREFIX_16 = struct.Struct('>BH')
+_PREFIX_32 = struct.Struct('>BI')
+
+
 def pack_string(obj):
     """Optimally pack a string according to msgpack format"""
     payload = str(obj).encode('ASCII')
     pl = len(payload)
     if pl < (2**5):
-        prefix = struct.pack('B', 0b10100000 | pl)
+        prefix = _FIXED_PREFIX.pack(0b10100000 | pl)
     elif pl < (2**8):
-        prefix = struct.pack('BB', 0xD9, pl)
+        prefix = _PREFIX_8.pack(0xD9, pl)
     elif pl < (2**16):
-        prefix = struct.pack('>BH', 0xDA, pl)
+        prefix = _PREFIX_16.pack(0xDA, pl)
     else:
-        prefix = struct.pack('>BI', 0xDB, pl)
+        prefix = _PREFIX_32.pack(0xDB, pl)
     return prefix + payload
 
 
@@ -56,11 +74,11 @@ def pack_bytes(payload):
     """Optimally pack a byte string according to msgpack format"""
     pl = len(payload)
     if pl < (2**8):
-        prefix = struct.pack('BB', 0xC4, pl)
+        prefix = _PREFIX_8.pack(0xC4, pl)
     elif pl < (2**16):
-        prefix = struct.pack('>BH', 0xC5, pl)
+        prefix = _PREFIX_16.pack(0xC5, pl)
     else:
-        prefix = struct.pack('>BI', 0xC6, pl)
+        prefix = _PREFIX_32.pack(0xC6, pl)
     return prefix + payload
 
 
@@ -111,7 +129,7 @@ class SendResponseTests(testing.AsyncHTTPTestCase):
     def test_that_default_content_type_is_set_on_response(self):
         response = self.fetch('/',
                               method='POST',
-                              body=umsgpack.packb({}),
+                              body=EMPTY_MSGPACK_MAP,
                               headers={'Content-Type': 'application/msgpack'})
         self.assertEqual(response.code, 200)
         self.assertEqual(response.headers['Content-Type'],
@@ -120,7 +138,7 @@ class SendResponseTests(testing.AsyncHTTPTestCase):
     def test_that_vary_header_is_set(self):
         response = self.fetch('/',
                               method='POST',
-                              body=umsgpack.packb({}),
+                              body=EMPTY_MSGPACK_MAP,
                               headers={'Content-Type': 'application/msgpack'})
         self.assertEqual(response.code, 200)
         self.assertEqual(response.headers['Vary'], 'Accept')
@@ -232,7 +250,8 @@ class GetRequestBodyTests(testing.AsyncHTTPTestCase):
                               body=umsgpack.packb(body),
                               headers={'Content-Type': 'application/msgpack'})
         self.assertEqual(response.code, 200)
-        self.assertEqual(json.loads(response.body.decode('utf-8')), body)
+        self.assertEqual(b'{"name":"value","embedded":{"utf8":"\\u2731"}}',
+                         response.body)
 
     def test_that_invalid_data_returns_400(self):
         response = self.fetch(
@@ -254,7 +273,7 @@ class GetRequestBodyTests(testing.AsyncHTTPTestCase):
             body=json.dumps(body),
             headers={'Content-Type': 'application/vendor+json'})
         self.assertEqual(response.code, 200)
-        self.assertEqual(json.loads(response.body.decode()), body)
+        self.assertEqual(b'{"hello":"world"}', response.body)
 
     def test_that_invalid_content_types_result_in_bad_request(self):
         content.set_default_content_type(self.app, None, None)
@@ -299,6 +318,54 @@ class MixinCacheTests(unittest.TestCase):
             self.assertIs(first, second)
             self.assertEqual(1, select_content_type.call_count)
 
+    def test_that_negotiated_types_are_cached_between_requests(self):
+        settings = content.get_settings(self.handler.application)
+        with unittest.mock.patch(
+                'sprockets.mixins.mediatype.content.algorithms.'
+                'select_content_type',
+                side_effect=algorithms.select_content_type
+        ) as select_content_type:
+            for _ in range(2):
+                self.assertEqual(
+                    'application/json',
+                    settings.select_response_type('application/json'))
+            self.assertEqual(1, select_content_type.call_count)
+
+            content.add_binary_content_type(self.handler.application,
+                                            'application/octet-stream', bytes,
+                                            bytes)
+            settings.select_response_type('application/json')
+            self.assertEqual(2, select_content_type.call_count)
+
+            settings.default_content_type = 'application/octet-stream'
+            settings.select_response_type('application/json')
+            self.assertEqual(3, select_content_type.call_count)
+
+    def test_that_negotiated_type_cache_is_bounded(self):
+        settings = content.get_settings(self.handler.application)
+        with unittest.mock.patch(
+                'sprockets.mixins.mediatype.content.'
+                '_RESPONSE_TYPE_CACHE_LIMIT', 1):
+            settings.select_response_type('application/json')
+            settings.select_response_type('application/*')
+            self.assertEqual(['application/*'], list(settings._response_types))
+
+            settings.select_response_type('application/json')
+            self.assertEqual(['application/json'],
+                             list(settings._response_types))
+
+    def test_that_negotiated_type_cache_evicts_least_recently_used(self):
+        settings = content.get_settings(self.handler.application)
+        with unittest.mock.patch(
+                'sprockets.mixins.mediatype.content.'
+                '_RESPONSE_TYPE_CACHE_LIMIT', 2):
+            settings.select_response_type('application/json')
+            settings.select_response_type('application/*')
+            settings.select_response_type('application/json')
+            settings.select_response_type('*/*')
+        self.assertEqual(['application/json', '*/*'],
+                         list(settings._response_types))
+
     def test_that_request_body_is_cached(self):
         self.transcoder.from_bytes = unittest.mock.Mock(
             wraps=self.transcoder.from_bytes)
@@ -307,6 +374,19 @@ class MixinCacheTests(unittest.TestCase):
         self.assertIs(first, second)
         self.assertEqual(1, self.transcoder.from_bytes.call_count)
 
+    def test_that_request_content_type_parsing_is_cached(self):
+        request = self.handler.request
+        request.headers['Content-Type'] = 'application/json; x-cached=1'
+        with unittest.mock.patch(
+                'sprockets.mixins.mediatype.content.headers.'
+                'parse_content_type',
+                side_effect=headers.parse_content_type) as parse_content_type:
+            for _ in range(2):
+                handler = content.ContentMixin(self.handler.application,
+                                               request)
+                self.assertEqual({}, handler.get_request_body())
+        self.assertEqual(1, parse_content_type.call_count)
+
 
 class JSONTranscoderTests(unittest.TestCase):
     def setUp(self):
@@ -316,36 +396,249 @@ class JSONTranscoderTests(unittest.TestCase):
     def test_that_uuids_are_dumped_as_strings(self):
         obj = {'id': uuid.uuid4()}
         dumped = self.transcoder.dumps(obj)
-        self.assertEqual(dumped.replace(' ', ''), '{"id":"%s"}' % obj['id'])
+        self.assertEqual(dumped, '{"id":"%s"}' % obj['id'])
 
     def test_that_datetimes_are_dumped_in_isoformat(self):
         obj = {'now': datetime.datetime.now()}
         dumped = self.transcoder.dumps(obj)
-        self.assertEqual(dumped.replace(' ', ''),
-                         '{"now":"%s"}' % obj['now'].isoformat())
+        self.assertEqual(dumped, '{"now":"%s"}' % obj['now'].isoformat())
 
     def test_that_tzaware_datetimes_include_tzoffset(self):
-        obj = {'now': datetime.datetime.now().replace(tzinfo=UTC())}
+        obj = {
+            'now': datetime.datetime.now().replace(
+                tzinfo=datetime.timezone.utc)
+        }
         self.assertTrue(obj['now'].isoformat().endswith('+00:00'))
         dumped = self.transcoder.dumps(obj)
-        self.assertEqual(dumped.replace(' ', ''),
-                         '{"now":"%s"}' % obj['now'].isoformat())
+        self.assertEqual(dumped, '{"now":"%s"}' % obj['now'].isoformat())
 
     def test_that_bytearrays_are_base64_encoded(self):
-        bin = bytearray(os.urandom(127))
+        bin = bytearray(SAMPLE_BYTES)
         dumped = self.transcoder.dumps({'bin': bin})
-        self.assertEqual(
-            dumped, '{"bin":"%s"}' % base64.b64encode(bin).decode('ASCII'))
+        self.assertEqual(SAMPLE_JSON, dumped)
 
     def test_that_memoryviews_are_base64_encoded(self):
-        bin = memoryview(os.urandom(127))
+        bin = memoryview(SAMPLE_BYTES)
+        dumped = self.transcoder.dumps({'bin': bin})
+        self.assertEqual(SAMPLE_JSON, dumped)
+
+    def test_that_noncontiguous_memoryviews_are_base64_encoded(self):
+        bin = memoryview(SAMPLE_BYTES)[::2]
         dumped = self.transcoder.dumps({'bin': bin})
         self.assertEqual(
-            dumped, '{"bin":"%s"}' % base64.b64encode(bin).decode('ASCII'))
+            dumped,
+            '{"bin":"%s"}' % base64.b64encode(bin.tobytes()).decode('ASCII'))
+
+    def test_that_binascii_is_used_if_pybase64_is_missing(self):
+        # load a private copy so that the module under test is untouched
+        spec = importlib.util.find_spec(transcoders.__name__)
+        module = importlib.util.module_from_spec(spec)
+        with unittest.mock.patch.dict(sys.modules, {'pybase64': None}):
+            spec.loader.exec_module(module)
+        self.assertIsNot(transcoders._b64encode, module._b64encode)
+
+        transcoder = module.JSONTranscoder()
+        for value in (SAMPLE_BYTES, bytearray(SAMPLE_BYTES),
+                      memoryview(SAMPLE_BYTES), memoryview(SAMPLE_BYTES)[::2]):
+            expected = base64.b64encode(bytes(value)).decode('ASCII')
+            self.assertEqual(expected, module._b64encode(bytes(value)))
+            self.assertEqual(f'"{expected}"', transcoder.dumps(value))
+
+    def test_that_subclasses_are_dumped(self):
+        class ByteArray(bytearray):
+            pass
+
+        class UUID(uuid.UUID):
+            pass
+
+        class DateTime(datetime.datetime):
+            pass
+
+        uid = uuid.uuid4()
+        now = DateTime.now()
+        dumped = self.transcoder.dumps(
+            [ByteArray(b'\x00'), UUID(str(uid)), now])
+        self.assertEqual(dumped, '["AA==","%s","%s"]' % (uid, now.isoformat()))
 
     def test_that_unhandled_objects_raise_type_error(self):
-        with self.assertRaises(TypeError):
-            self.transcoder.dumps(object())
+        obj = object()
+        with self.assertRaises(TypeError) as context:
+            self.transcoder.dumps(obj)
+        self.assertEqual((f'{obj!r} is not JSON serializable', ),
+                         context.exception.args)
+
+    def test_that_to_bytes_reports_the_selected_charset(self):
+        for encoding, expected in [(None, 'utf-8'), ('latin-1', 'latin-1'),
+                                   (None, 'utf-8')]:
+            content_type, _ = self.transcoder.to_bytes({}, encoding=encoding)
+            self.assertEqual(f'application/json; charset="{expected}"',
+                             content_type)
+
+    def test_that_dumps_matches_json_module(self):
+        shared = [1]
+        values = [
+            [1, 2.5, None, True, 'str', [[]], (0.0, 1e-4)],
+            dict([(1, 'non-string key')]),
+            dict([(2.5, 'float key')]),
+            'non-ascii \u2731',
+            ['caf\u00e9', 'del \x7f', 'astral \U0001f600'],
+            'del \x7f',
+            dict([('del \x7f', 'key')]),
+            dict([('k\u00e9y', 'non-ascii key')]),
+            ['\x00\x1f"\\', '\u2028\u2029', 'lone \ud800'],
+            2**70,
+            datetime.datetime.now(),
+            datetime.date.today(),
+            uuid.uuid4(),
+            [math.nan, math.inf, -math.inf],
+            [1e16, -1e16, 1e-7, 1e22, 5e-324],
+            [shared, shared],
+            [IntEnum.ONE, StrEnum.VALUE],
+        ]
+        for value in values:
+            expected = json.dumps(value,
+                                  default=self.transcoder.dump_object,
+                                  separators=(',', ':'))
+            self.assertEqual(expected, self.transcoder.dumps(value))
+            with unittest.mock.patch(
+                    'sprockets.mixins.mediatype.transcoders.orjson',
+                    new_callable=lambda: None):
+                self.assertEqual(expected, self.transcoder.dumps(value))
+
+    def test_that_overridden_dump_object_is_used(self):
+        class Transcoder(transcoders.JSONTranscoder):
+            def dump_object(self, obj):
+                if isinstance(obj, uuid.UUID):
+                    return obj.hex
+                return super().dump_object(obj)
+
+        uid = uuid.uuid4()
+        self.assertEqual('["%s"]' % uid.hex, Transcoder().dumps([uid]))
+
+    def test_that_dumps_rejects_what_json_module_rejects(self):
+        cyclic = []
+        cyclic.append(cyclic)
+        values = [
+            (PlainEnum.VALUE, TypeError),
+            (dict([(uuid.uuid4(), 'uuid key')]), TypeError),
+            (dict([(datetime.date.today(), 'date key')]), TypeError),
+            (cyclic, ValueError),
+        ]
+        for value, exc_class in values:
+            with self.assertRaises(exc_class):
+                self.transcoder.dumps(value)
+            with unittest.mock.patch(
+                    'sprockets.mixins.mediatype.transcoders.orjson',
+                    new_callable=lambda: None):
+                with self.assertRaises(exc_class):
+                    self.transcoder.dumps(value)
+
+    def test_that_to_bytes_rejects_self_referential_values(self):
+        data = [{}]
+        data.append(data)
+        with self.assertRaises(ValueError):
+            self.transcoder.to_bytes(data)
+
+        data.append(b'bytes')
+        with self.assertRaises(RecursionError):
+            self.transcoder.to_bytes(data)
+
+    def test_that_to_bytes_matches_text_content_handler(self):
+        values = [
+            dict(text='non-ascii \u2731', bytes=b'utf-8 \xe2\x9c\xb1'),
+            dict(text='ascii', bytes=b'ascii'),
+            dict(text='del \x7f', bytes=b'del \x7f'),
+            [b'utf-8 \xe2\x9c\xb1', 'ascii'],
+            dict([(b'bytes key', 'value')]),
+            dict([('k\u00e9y', 'non-ascii key')]),
+            [datetime.datetime.now(), uuid.uuid4()],
+            [bytearray(b'\x00'), memoryview(b'\x01')],
+            [math.nan, math.inf, -math.inf],
+            [1e16, 1e-7, 2.5],
+            [IntEnum.ONE, StrEnum.VALUE],
+            2**70,
+        ]
+        for encoding in (None, 'utf-8', 'latin-1'):
+            for value in values:
+                content_type, dumped = self.transcoder.to_bytes(
+                    value, encoding=encoding)
+                with unittest.mock.patch.object(transcoders, 'orjson', None):
+                    expected = handlers.TextContentHandler.to_bytes(
+                        self.transcoder, value, encoding=encoding)
+                self.assertEqual(expected, (content_type, dumped))
+
+    def test_that_to_bytes_uses_overridden_dumps(self):
+        class Transcoder(transcoders.JSONTranscoder):
+            def dumps(self, obj):
+                return 'overridden'
+
+        _, dumped = Transcoder().to_bytes({})
+        self.assertEqual(b'overridden', dumped)
+
+    def test_that_to_bytes_uses_overridden_dump_object(self):
+        class Transcoder(transcoders.JSONTranscoder):
+            def dump_object(self, obj):
+                if isinstance(obj, uuid.UUID):
+                    return obj.hex
+                return super().dump_object(obj)
+
+        uid = uuid.uuid4()
+        _, dumped = Transcoder().to_bytes([uid])
+        self.assertEqual(b'["%s"]' % uid.hex.encode(), dumped)
+
+    def test_that_modified_dump_options_are_used(self):
+        self.transcoder.dump_options['indent'] = 2
+        self.assertEqual('[\n  1\n]', self.transcoder.dumps([1]))
+
+    def test_that_dump_options_can_change_between_calls(self):
+        with unittest.mock.patch(
+                'sprockets.mixins.mediatype.transcoders.orjson',
+                new_callable=lambda: None):
+            self.assertEqual('[1,2]', self.transcoder.dumps([1, 2]))
+            self.transcoder.dump_options['separators'] = (', ', ': ')
+            self.assertEqual('[1, 2]', self.transcoder.dumps([1, 2]))
+
+    def test_that_encoder_class_option_is_used(self):
+        class Encoder(json.JSONEncoder):
+            def encode(self, o):
+                return 'encoded'
+
+        self.transcoder.dump_options['cls'] = Encoder
+        self.assertEqual('encoded', self.transcoder.dumps([1]))
+
+
+class TextContentHandlerTests(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.dumps = unittest.mock.Mock(return_value='')
+        self.handler = handlers.TextContentHandler('text/plain', self.dumps,
+                                                   str, 'utf-8')
+
+    def test_that_text_values_are_dumped_without_copying(self):
+        data = {'list': [1, 2.0, None, True], 'tuple': ('str', {})}
+        self.handler.to_bytes(data)
+        self.dumps.assert_called_once()
+        self.assertIs(data, self.dumps.call_args[0][0])
+
+    def test_that_nested_bytes_are_decoded(self):
+        data = collections.OrderedDict(values=[(b'bytes', )])
+        self.handler.to_bytes(data)
+        self.dumps.assert_called_once_with({'values': [('bytes', )]})
+
+    def test_that_container_types_are_kept_without_bytes(self):
+        data = collections.OrderedDict(values=[uuid.UUID(int=0)])
+        self.handler.to_bytes(data)
+        self.assertIs(data, self.dumps.call_args[0][0])
+
+        data['bytes'] = b'bytes'
+        self.handler.to_bytes(data)
+        self.assertIs(dict, type(self.dumps.call_args[0][0]))
+
+    def test_that_self_referential_values_are_scanned_once(self):
+        data = {'list': []}
+        data['list'].append(data)
+        self.handler.to_bytes(data)
+        self.assertIs(data, self.dumps.call_args[0][0])
 
 
 class ContentSettingsTests(unittest.TestCase):
@@ -373,6 +666,17 @@ class ContentSettingsTests(unittest.TestCase):
         self.assertIn('application/json; type=whatever; version=foo',
                       (str(c) for c in settings.available_content_types))
 
+    def test_that_lookup_normalization_is_cached(self):
+        settings = content.ContentSettings()
+        settings['application/vnd.cached+json'] = handler = object()
+        with unittest.mock.patch(
+                'sprockets.mixins.mediatype.content.headers.'
+                'parse_content_type',
+                side_effect=headers.parse_content_type) as parse_content_type:
+            for _ in range(2):
+                self.assertIs(handler, settings['Application/Vnd.Cached+JSON'])
+        self.assertEqual(1, parse_content_type.call_count)
+
     def test_that_normalized_content_types_do_not_overwrite(self):
         settings = content.ContentSettings()
         settings['application/json; charset=UTF-8'] = handler = object()
@@ -494,8 +798,10 @@ class MsgPackTranscoderTests(unittest.TestCase):
         self.assertEqual(dumped, b'\x90')
 
     def test_that_unhandled_objects_raise_type_error(self):
-        with self.assertRaises(TypeError):
+        with self.assertRaises(TypeError) as context:
             self.transcoder.packb(object())
+        self.assertEqual(('object is not msgpackable', ),
+                         context.exception.args)
 
     def test_that_uuids_are_dumped_as_strings(self):
         uid = uuid.uuid4()
@@ -510,30 +816,37 @@ class MsgPackTranscoderTests(unittest.TestCase):
         self.assertEqual(dumped, pack_string(now.isoformat()))
 
     def test_that_tzaware_datetimes_include_tzoffset(self):
-        now = datetime.datetime.now().replace(tzinfo=UTC())
+        now = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
         self.assertTrue(now.isoformat().endswith('+00:00'))
         dumped = self.transcoder.packb(now)
         self.assertEqual(self.transcoder.unpackb(dumped), now.isoformat())
         self.assertEqual(dumped, pack_string(now.isoformat()))
 
     def test_that_bytes_are_sent_as_bytes(self):
-        data = bytes(os.urandom(127))
+        data = SAMPLE_BYTES
         dumped = self.transcoder.packb(data)
         self.assertEqual(self.transcoder.unpackb(dumped), data)
         self.assertEqual(dumped, pack_bytes(data))
 
     def test_that_bytearrays_are_sent_as_bytes(self):
-        data = bytearray(os.urandom(127))
+        data = bytearray(SAMPLE_BYTES)
         dumped = self.transcoder.packb(data)
         self.assertEqual(self.transcoder.unpackb(dumped), data)
         self.assertEqual(dumped, pack_bytes(data))
 
     def test_that_memoryviews_are_sent_as_bytes(self):
-        data = memoryview(os.urandom(127))
+        data = memoryview(SAMPLE_BYTES)
+        self.assertIs(data, self.transcoder.normalize_datum(data))
         dumped = self.transcoder.packb(data)
         self.assertEqual(self.transcoder.unpackb(dumped), data)
         self.assertEqual(dumped, pack_bytes(data.tobytes()))
 
+    def test_that_noncontiguous_memoryviews_are_sent_as_bytes(self):
+        data = memoryview(SAMPLE_BYTES)[::2]
+        dumped = self.transcoder.packb(data)
+        self.assertEqual(self.transcoder.unpackb(dumped), data.tobytes())
+        self.assertEqual(dumped, pack_bytes(data.tobytes()))
+
     def test_that_utf8_values_can_be_forced_to_bytes(self):
         data = b'a ascii value'
         dumped = self.transcoder.packb(data)
@@ -545,13 +858,176 @@ class MsgPackTranscoderTests(unittest.TestCase):
         dumped = self.transcoder.packb(data)
         self.assertEqual(b'\x82\xA7compact\xC3\xA6schema\x00', dumped)
 
-    def test_that_transcoder_creation_fails_if_umsgpack_is_missing(self):
-        with unittest.mock.patch(
-                'sprockets.mixins.mediatype.transcoders.umsgpack',
-                new_callable=lambda: None):
+    def test_that_packable_values_are_not_normalized(self):
+        data = {'list': [1, 2.0, 'three', b'four', None, True], 'map': {}}
+        with unittest.mock.patch.object(self.transcoder,
+                                        'normalize_datum') as normalize:
+            dumped = self.transcoder.packb(data)
+        normalize.assert_not_called()
+        self.assertEqual(data, self.transcoder.unpackb(dumped))
+
+    def test_that_scalars_are_normalized_to_themselves(self):
+        for value in (None, True, b'bytes', 1.0, 1, 'str'):
+            self.assertIs(value, self.transcoder.normalize_datum(value))
+
+    def test_that_packable_containers_are_not_copied(self):
+        data = {'id': uuid.uuid4(), 'list': [1, 'two'], 'map': {'a': None}}
+        normalized = self.transcoder.normalize_datum(data)
+        self.assertEqual(str(data['id']), normalized['id'])
+        self.assertIs(data['list'], normalized['list'])
+        self.assertIs(data['map'], normalized['map'])
+
+    def test_that_deeply_nested_values_are_normalized(self):
+        # each level adds a dict and a list to the root list
+        levels = (transcoders._MSGPACK_MAX_DEPTH - 1) // 2
+        root = data = leaf = [uuid.uuid4()]
+        for _ in range(levels):
+            leaf.append({'nested': [uuid.uuid4()]})
+            leaf = leaf[-1]['nested']
+        normalized = self.transcoder.normalize_datum(data)
+        for _ in range(levels):
+            self.assertEqual(str(data[0]), normalized[0])
+            data, normalized = data[1]['nested'], normalized[1]['nested']
+
+        leaf.append([uuid.uuid4()])
+        with self.assertRaises(ValueError):
+            self.transcoder.normalize_datum(root)
+
+    def test_that_self_referential_values_fail(self):
+        data = [{1}]
+        data.append(data)
+        with self.assertRaises(ValueError):
+            self.transcoder.normalize_datum(data)
+        with self.assertRaises(ValueError):
+            self.transcoder.packb(data)
+
+    def test_that_subclasses_are_normalized(self):
+        class Int(int):
+            pass
+
+        class Str(str):
+            pass
+
+        class ByteArray(bytearray):
+            pass
+
+        class UUID(uuid.UUID):
+            pass
+
+        class DateTime(datetime.datetime):
+            pass
+
+        uid = uuid.uuid4()
+        now = datetime.datetime.now()
+        data = collections.OrderedDict([
+            ('int', Int(1)),
+            ('str', Str('str')),
+            ('bytes', ByteArray(b'bytes')),
+            ('uuid', UUID(str(uid))),
+            ('datetime', DateTime.fromisoformat(now.isoformat())),
+            ('list', collections.UserList([1, 2])),
+        ])
+        expected = {
+            'int': 1,
+            'str': 'str',
+            'bytes': b'bytes',
+            'uuid': str(uid),
+            'datetime': now.isoformat(),
+            'list': [1, 2],
+        }
+        self.assertEqual(expected, self.transcoder.normalize_datum(data))
+        self.assertEqual(self.transcoder.packb(expected),
+                         self.transcoder.packb(data))
+
+    def test_that_overridden_normalize_datum_is_used(self):
+        class Transcoder(transcoders.MsgPackTranscoder):
+            def normalize_datum(self, datum):
+                if isinstance(datum, uuid.UUID):
+                    return datum.hex
+                return super().normalize_datum(datum)
+
+        class UpperCaseTranscoder(transcoders.MsgPackTranscoder):
+            def normalize_datum(self, datum):
+                if isinstance(datum, str):
+                    return datum.upper()
+                return super().normalize_datum(datum)
+
+        uid = uuid.uuid4()
+        transcoder = Transcoder()
+        self.assertEqual(pack_string(uid.hex), transcoder.packb(uid))
+        self.assertEqual(transcoder.packb([{1, 2}]),
+                         self.transcoder.packb([[1, 2]]))
+        transcoder = UpperCaseTranscoder()
+        self.assertEqual(pack_string('LOWER'), transcoder.packb('lower'))
+        data = {'a': 'lower', 'l': ('lower', 1), 's': {1}}
+        self.assertEqual({
+            'a': 'LOWER',
+            'l': ['LOWER', 1],
+            's': [1]
+        }, transcoder.unpackb(transcoder.packb(data)))
+
+    def test_that_packing_works_from_multiple_threads(self):
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(self.transcoder.packb('foo')))
+        thread.start()
+        thread.join()
+        self.assertEqual([pack_string('foo')], results)
+        self.assertEqual(pack_string('foo'), self.transcoder.packb('foo'))
+
+    def test_that_large_packers_are_not_reused(self):
+        limit = transcoders._MSGPACK_PACKER_REUSE_LIMIT
+        self.transcoder.packb(b'x' * (limit - 8))
+        self.assertTrue(hasattr(self.transcoder._packers, 'packer'))
+
+        data = {'a': b'x' * limit}
+        self.assertEqual(data,
+                         self.transcoder.unpackb(self.transcoder.packb(data)))
+        self.assertFalse(hasattr(self.transcoder._packers, 'packer'))
+        self.assertEqual(pack_string('foo'), self.transcoder.packb('foo'))
+
+    def test_that_transcoders_can_be_copied_and_pickled(self):
+        uid = uuid.uuid4()
+        self.transcoder.packb(uid)
+        for clone in (copy.copy(self.transcoder),
+                      copy.deepcopy(self.transcoder),
+                      pickle.loads(pickle.dumps(self.transcoder))):
+            self.assertIsNot(self.transcoder._packers, clone._packers)
+            self.assertEqual(pack_string(uid), clone.packb(uid))
+            self.assertEqual(str(uid), clone.unpackb(clone.packb(uid)))
+
+    def test_that_transcoder_creation_fails_if_msgpack_is_missing(self):
+        with unittest.mock.patch.multiple(transcoders,
+                                          msgpack=None,
+                                          umsgpack=None):
             with self.assertRaises(RuntimeError):
                 transcoders.MsgPackTranscoder()
 
+    def test_that_umsgpack_is_used_if_msgpack_is_missing(self):
+        with unittest.mock.patch.object(transcoders, 'msgpack', None):
+            transcoder = transcoders.MsgPackTranscoder()
+
+        data = {'compact': True, 'schema': 0, 'bytes': b'\x00'}
+        dumped = transcoder.packb(data)
+        self.assertEqual(umsgpack.packb(data), dumped)
+        self.assertEqual(data, transcoder.unpackb(dumped))
+
+        dumped = transcoder.packb([bytearray(b'\x00'), memoryview(b'\x01')])
+        self.assertEqual(umsgpack.packb([b'\x00', b'\x01']), dumped)
+
+    def test_that_umsgpack_rejects_self_referential_values(self):
+        with unittest.mock.patch.object(transcoders, 'msgpack', None):
+            transcoder = transcoders.MsgPackTranscoder()
+
+        shared = {'list': [1]}
+        data = [shared, shared]
+        self.assertEqual(umsgpack.packb(data), transcoder.packb(data))
+
+        data = []
+        data.append(data)
+        with self.assertRaises(ValueError):
+            transcoder.packb(data)
+
 
 class FormUrlEncodingTranscoderTests(unittest.TestCase):
     transcoder: type_info.Transcoder
@@ -608,11 +1084,24 @@ class FormUrlEncodingTranscoderTests(unittest.TestCase):
                 f'id={id_val}',
             ]))
 
+    def test_that_objects_with_isoformat_are_serialized(self):
+        class Timestamp:
+            def isoformat(self):
+                return '2021-01-01T00:00:00'
+
+        _, result = self.transcoder.to_bytes({'when': Timestamp()})
+        self.assertEqual(b'when=2021-01-01T00%3A00%3A00', result)
+
     def test_that_serialization_encoding_can_be_overridden(self):
         _, result = self.transcoder.to_bytes([('kolor', 'żółty')],
                                              encoding='iso-8859-2')
         self.assertEqual(b'kolor=%bf%f3%b3ty', result.lower())
 
+    def test_that_ascii_incompatible_encodings_are_quoted(self):
+        _, result = self.transcoder.to_bytes([('name', 'value')],
+                                             encoding='utf-16-be')
+        self.assertEqual(b'%00n%00a%00m%00e=%00v%00a%00l%00u%00e', result)
+
     def test_serialization_edge_cases(self):
         _, result = self.transcoder.to_bytes([
             ('', ''),
@@ -652,14 +1141,21 @@ class FormUrlEncodingTranscoderTests(unittest.TestCase):
         pct_chrs.update({c for c in '$%&+,'})  # component set
         pct_chrs.update({c for c in "!'()~"})  # formurlencoding set
 
-        test_string = ''.join(pct_chrs)
-        expected = ''.join('%{:02X}'.format(ord(c)) for c in test_string)
+        test_string = ''.join(sorted(pct_chrs))
+        expected = ''.join([f'%{ord(c):02X}' for c in test_string])
         expected = f'test_string={expected}'.encode()
         _, result = self.transcoder.to_bytes({'test_string': test_string})
         self.assertEqual(expected, result)
 
+    def test_that_all_octets_can_be_encoded(self):
+        _, result = self.transcoder.to_bytes(bytes(range(256)))
+        self.assertEqual(
+            urllib.parse.quote_from_bytes(bytes(range(256)),
+                                          safe='*').replace('~', '%7E'),
+            result.decode())
+
     def test_serialization_of_primitives(self):
-        id_val = uuid.uuid4()
+        id_val = uuid.UUID('12345678-1234-5678-1234-567812345678')
         expectations = {
             None: b'',
             'a string': b'a%20string',
@@ -669,12 +1165,22 @@ class FormUrlEncodingTranscoderTests(unittest.TestCase):
             False: b'false',
             b'\xfe\xed\xfa\xce': b'%FE%ED%FA%CE',
             memoryview(b'\xfe\xed\xfa\xce'): b'%FE%ED%FA%CE',
-            id_val: str(id_val).encode(),
+            id_val: b'12345678-1234-5678-1234-567812345678',
         }
         for value, expected in expectations.items():
             _, result = self.transcoder.to_bytes(value)
             self.assertEqual(expected, result)
 
+    def test_serialization_of_subclasses(self):
+        class Str(str):
+            pass
+
+        class Int(int):
+            pass
+
+        _, result = self.transcoder.to_bytes({Str('a b'): Int(1)})
+        self.assertEqual(b'a%20b=1', result)
+
     def test_serialization_with_empty_literal_map(self):
         self.transcoder: transcoders.FormUrlEncodedTranscoder
         self.transcoder.options.literal_mapping.clear()
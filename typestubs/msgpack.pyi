@@ -0,0 +1,30 @@
+import typing
+
+def packb(o: typing.Any,
+          *,
+          default: typing.Optional[typing.Callable[[typing.Any],
+                                                   typing.Any]] = None,
+          use_bin_type: bool = True,
+          **kwargs: typing.Any) -> bytes:
+    ...
+
+
+def unpackb(packed: bytes,
+            *,
+            raw: bool = False,
+            strict_map_key: bool = True,
+            **kwargs: typing.Any) -> typing.Any:
+    ...
+
+
+class Packer:
+    def __init__(self,
+                 *,
+                 default: typing.Optional[typing.Callable[[typing.Any],
+                                                          typing.Any]] = None,
+                 use_bin_type: bool = True,
+                 **kwargs: typing.Any) -> None:
+        ...
+
+    def pack(self, obj: typing.Any) -> bytes:
+        ...